@@ -0,0 +1,9 @@
+# config.py
+
+# --- Inference Settings ---
+# Shared by main.py and export_engine.py, so the exported engine always
+# matches the batch and input size the app runs with.
+WEIGHTS_PATH = 'best.pt'
+MODEL_PATH = 'best.engine' # FP16 TensorRT engine built by export_engine.py
+BATCH_SIZE = 8 # Frames per detection call
+IMAGE_SIZE = 480 # Detection input size (multiple of the model stride, 32)
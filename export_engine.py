@@ -0,0 +1,22 @@
+# export_engine.py
+
+from ultralytics import YOLO
+from config import BATCH_SIZE, IMAGE_SIZE, WEIGHTS_PATH
+
+def main():
+    """
+    One-shot export of the PyTorch weights to an FP16 TensorRT engine.
+
+    Writes 'best.engine' next to the weights, which main.py then loads.
+    The engine is built for config.py's BATCH_SIZE and IMAGE_SIZE, so
+    re-export after changing them.
+    For INT8, pass int8=True and data='<dataset.yaml>' pointing at ~200
+    calibration frames instead of half=True.
+    """
+    model = YOLO(WEIGHTS_PATH)
+    # dynamic=True lets the engine accept the shorter final batch too
+    model.export(format='engine', half=True, imgsz=IMAGE_SIZE,
+                 batch=BATCH_SIZE, dynamic=True, device=0)
+
+if __name__ == "__main__":
+    main()
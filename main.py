@@ -1,64 +1,87 @@
 # main.py
 
+import os
+
 import cv2
+import torch
 from ultralytics import YOLO
-from utils.read_save import read_video, save_video
+from config import BATCH_SIZE, IMAGE_SIZE, MODEL_PATH, WEIGHTS_PATH
+from utils.labels import LabelRenderer
+from utils.read_save import read_batches, read_video, save_video
 from utils.tracker import ReIDTracker # <-- IMPORT our new Re-ID Tracker
 
 # --- Configuration ---
-MODEL_PATH = 'best.pt'
 INPUT_VIDEO_PATH = '15sec_input_720p.mp4'
 OUTPUT_VIDEO_PATH = 'player_reid_output.mp4'
+DEVICE = 0 # GPU index for inference, or 'cpu' to run best.pt in FP32
+PLAYER_CLASSES = ('player', 'goalkeeper')
+OUTPUT_SCALE = 0.5 # Output video size relative to the input
+OUTPUT_FRAME_STEP = 2 # Write every Nth frame (output runs at fps / N)
 
 def main():
     # --- Load Model ---
-    model = YOLO(MODEL_PATH)
+    # The TensorRT engine only runs on a GPU and must be built first with
+    # export_engine.py; otherwise fall back to the PyTorch weights.
+    # FP16 is used on any GPU, FP32 on CPU.
+    on_gpu = DEVICE != 'cpu'
+    use_engine = on_gpu and os.path.exists(MODEL_PATH)
+    if on_gpu and not use_engine:
+        print(f"{MODEL_PATH} not found, using {WEIGHTS_PATH}. "
+              "Run export_engine.py for faster inference.")
+    model = YOLO(MODEL_PATH if use_engine else WEIGHTS_PATH)
+    player_class_ids = torch.tensor(
+        [class_id for class_id, name in model.names.items() if name in PLAYER_CLASSES])
     
     # --- Initialize Our New Re-ID Tracker ---
     tracker = ReIDTracker(max_disappeared=20, max_distance=75)
+    labels = LabelRenderer()
 
     # --- Read Video ---
     cap, fps, frame_size = read_video(INPUT_VIDEO_PATH)
     if cap is None: return
 
     # --- Setup Video Writer ---
-    out = save_video(OUTPUT_VIDEO_PATH, fps, frame_size)
+    # The output is a smaller, lower frame rate preview of the input
+    output_size = (int(frame_size[0] * OUTPUT_SCALE), int(frame_size[1] * OUTPUT_SCALE))
+    out = save_video(OUTPUT_VIDEO_PATH, fps / OUTPUT_FRAME_STEP, output_size)
+    frame_index = 0
 
     # --- Process Frames ---
-    while True:
-        success, frame = cap.read()
-        if not success: break
-
+    # Frames are decoded on a background thread while the GPU runs detection.
+    # Several frames go through the model at once to keep the GPU busy.
+    for frames in read_batches(cap, BATCH_SIZE):
         # Run detection
-        results = model(frame, conf=0.5)
+        results = model.predict(frames, conf=0.5, imgsz=IMAGE_SIZE, device=DEVICE,
+                                half=on_gpu, verbose=False)
         
-        # --- Prepare Detections for the Tracker ---
-        # The new tracker needs the bounding box for histogram calculation
-        detections_for_tracker = []
-        for result in results:
-            player_classes = ['player', 'goalkeeper'] 
-            for box in result.boxes:
-                class_name = model.names[int(box.cls[0])]
-                if class_name in player_classes:
-                    x1, y1, x2, y2 = box.xyxy[0]
-                    bbox = (x1, y1, x2, y2)
-                    cx = int((x1 + x2) / 2)
-                    cy = int((y1 + y2) / 2)
-                    centroid = (cx, cy)
-                    detections_for_tracker.append({'bbox': bbox, 'centroid': centroid})
+        # The tracker must still see the frames one by one, in order
+        for frame, result in zip(frames, results):
+            # --- Prepare Detections for the Tracker ---
+            # Keep only the players while the boxes are still on the GPU,
+            # then copy just those to the CPU as one array.
+            # The tracker needs the bounding boxes for histogram calculation.
+            classes = result.boxes.cls
+            # A no-op once the ids are on the results' device and dtype
+            player_class_ids = player_class_ids.to(classes)
+            is_player = torch.isin(classes, player_class_ids)
+            boxes = result.boxes.xyxy[is_player].float().cpu().numpy()
+
+            # --- Update Tracker ---
+            # We pass the full frame so the tracker can crop player images
+            tracked_players = tracker.update(boxes, frame)
 
-        # --- Update Tracker ---
-        # We pass the full frame so the tracker can crop player images
-        tracked_players = tracker.update(detections_for_tracker, frame)
+            # The tracker sees every frame, but only every Nth one is saved
+            is_saved = frame_index % OUTPUT_FRAME_STEP == 0
+            frame_index += 1
+            if not is_saved: continue
 
-        # --- Visualize Results ---
-        for player_id, player_data in tracked_players.items():
-            centroid = player_data['centroid']
-            cv2.circle(frame, centroid, 5, (0, 0, 255), -1)
-            cv2.putText(frame, f"ID: {player_id}", (centroid[0] - 10, centroid[1] - 15), 
-                        cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 255, 0), 2)
+            # --- Visualize Results ---
+            for player_id, player_data in tracked_players.items():
+                centroid = player_data['centroid']
+                cv2.circle(frame, centroid, 5, (0, 0, 255), -1)
+                labels.draw(frame, player_id, (centroid[0] - 10, centroid[1] - 15))
 
-        out.write(frame)
+            out.write(cv2.resize(frame, output_size, interpolation=cv2.INTER_AREA))
 
     # --- Cleanup ---
     cap.release()
@@ -0,0 +1,65 @@
+# utils/labels.py
+
+import cv2
+import numpy as np
+
+class LabelRenderer:
+    def __init__(self, font=cv2.FONT_HERSHEY_SIMPLEX, font_scale=0.5,
+                 color=(0, 255, 0), thickness=2):
+        """
+        Draws "ID: N" labels by stamping pre-rendered patches onto frames.
+
+        Each ID's text is rasterized once, the first time it is drawn, and
+        then copied into the frame on every later call instead of calling
+        cv2.putText again.
+
+        Args:
+            font (int): OpenCV font face.
+            font_scale (float): Font size multiplier.
+            color (tuple): BGR color of the text.
+            thickness (int): Stroke thickness of the text.
+        """
+        self.font = font
+        self.font_scale = font_scale
+        self.thickness = thickness
+        self._color_u8 = np.array(color, dtype=np.uint8)
+        self._label_cache = {}  # {player_id: (mask, dx, dy)}
+
+    def _render(self, player_id):
+        """Rasterizes the label for an ID into a small boolean text mask."""
+        text = f"ID: {player_id}"
+        (width, height), baseline = cv2.getTextSize(
+            text, self.font, self.font_scale, self.thickness)
+        pad = self.thickness
+        # Rendering into its own single-channel mask works for any text
+        # color, including black. The default LINE_8 is not anti-aliased,
+        # so every pixel is either text or background.
+        mask = np.zeros((height + baseline + 2 * pad, width + 2 * pad), dtype=np.uint8)
+        cv2.putText(mask, text, (pad, pad + height), self.font, self.font_scale,
+                    255, self.thickness)
+        # Offset from the text origin (bottom-left, like cv2.putText) to the
+        # mask's top-left corner.
+        return mask > 0, -pad, -(pad + height)
+
+    def draw(self, frame, player_id, origin):
+        """
+        Draws the label for `player_id` with its bottom-left corner at `origin`.
+
+        The text color is stamped through the cached mask, so it looks the
+        same as cv2.putText. Labels that run off the edge of the frame are
+        clipped.
+        """
+        if player_id not in self._label_cache:
+            self._label_cache[player_id] = self._render(player_id)
+        mask, dx, dy = self._label_cache[player_id]
+
+        x, y = origin[0] + dx, origin[1] + dy
+        frame_h, frame_w = frame.shape[:2]
+        x0, y0 = max(x, 0), max(y, 0)
+        x1 = min(x + mask.shape[1], frame_w)
+        y1 = min(y + mask.shape[0], frame_h)
+        if x0 >= x1 or y0 >= y1:
+            return
+
+        np.copyto(frame[y0:y1, x0:x1], self._color_u8,
+                  where=mask[y0 - y:y1 - y, x0 - x:x1 - x, None])
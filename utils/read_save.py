@@ -1,7 +1,13 @@
 # utils/video_utils.py
 
+import queue
+import threading
+
 import cv2
 
+# Frame rate assumed for videos that do not report one.
+DEFAULT_FPS = 30.0
+
 def read_video(video_path):
     """
     Reads a video file and returns the capture object and its properties.
@@ -10,34 +16,114 @@ def read_video(video_path):
         video_path (str): The path to the video file.
 
     Returns:
-        tuple: A tuple containing the video capture object, frames per second,
+        tuple: A tuple containing the video capture object, frames per second
+               (a float, e.g. 29.97; DEFAULT_FPS if the file reports none),
                and frame dimensions (width, height).
         Returns (None, None, None) if the video cannot be opened.
     """
-    cap = cv2.VideoCapture(video_path)
+    # Ask FFmpeg for hardware-accelerated decoding first. These properties
+    # only take effect when passed at open time, not through cap.set().
+    cap = cv2.VideoCapture(video_path, cv2.CAP_FFMPEG, [
+        cv2.CAP_PROP_HW_ACCELERATION, cv2.VIDEO_ACCELERATION_ANY,
+        cv2.CAP_PROP_HW_ACCELERATION_USE_OPENCL, 1,
+    ])
+    if not cap.isOpened():
+        # Fall back to the default (software) decoder
+        cap = cv2.VideoCapture(video_path)
     if not cap.isOpened():
         print(f"Error: Could not open video file at {video_path}")
         return None, None, None
     
-    fps = int(cap.get(cv2.CAP_PROP_FPS))
+    fps = cap.get(cv2.CAP_PROP_FPS)
+    if fps <= 0:
+        # Some containers report 0 fps, and a VideoWriter won't open at 0
+        print(f"Warning: {video_path} reports no frame rate, assuming {DEFAULT_FPS}")
+        fps = DEFAULT_FPS
     frame_width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
     frame_height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
     frame_size = (frame_width, frame_height)
     
     return cap, fps, frame_size
 
+def read_frames(cap, queue_size=4):
+    """
+    Yields frames from a video capture, decoding them on a background thread.
+
+    Decoding runs ahead of the caller, so reading the next frame overlaps
+    with whatever the caller does with the current one (e.g. inference).
+
+    Args:
+        cap (cv2.VideoCapture): An opened video capture object.
+        queue_size (int): Max number of decoded frames waiting to be used.
+
+    Yields:
+        np.array: The next video frame, in order.
+    """
+    frames = queue.Queue(maxsize=queue_size)
+
+    def decode():
+        while True:
+            success, frame = cap.read()
+            if not success: break
+            frames.put(frame)
+        frames.put(None) # Signals the end of the video
+
+    thread = threading.Thread(target=decode, daemon=True)
+    thread.start()
+
+    while True:
+        frame = frames.get()
+        if frame is None: break
+        yield frame
+
+    thread.join()
+
+def read_batches(cap, batch_size, queue_size=None):
+    """
+    Yields lists of up to `batch_size` consecutive frames from a video capture.
+
+    Args:
+        cap (cv2.VideoCapture): An opened video capture object.
+        batch_size (int): Number of frames per batch. The last batch may be
+                          shorter.
+        queue_size (int): Max number of decoded frames waiting to be used.
+                          Defaults to two batches, so the next batch can be
+                          fully decoded while the current one is in use.
+
+    Yields:
+        list: The next batch of video frames, in order.
+    """
+    if queue_size is None:
+        queue_size = 2 * batch_size
+
+    batch = []
+    for frame in read_frames(cap, queue_size):
+        batch.append(frame)
+        if len(batch) == batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
 def save_video(output_path, fps, frame_size):
     """
     Creates a VideoWriter object to save a video file.
 
     Args:
         output_path (str): The path to save the output video file.
-        fps (int): The frames per second for the output video.
+        fps (float): The frames per second for the output video.
         frame_size (tuple): The dimensions (width, height) for the output video.
 
     Returns:
         cv2.VideoWriter: The VideoWriter object.
     """
-    fourcc = cv2.VideoWriter_fourcc(*'mp4v') # Codec for .mp4 files
-    out = cv2.VideoWriter(output_path, fourcc, fps, frame_size)
+    # Prefer H.264 through FFmpeg, with hardware encoding when available
+    fourcc = cv2.VideoWriter_fourcc(*'avc1')
+    out = cv2.VideoWriter(output_path, cv2.CAP_FFMPEG, fourcc, fps, frame_size, [
+        cv2.VIDEOWRITER_PROP_HW_ACCELERATION, cv2.VIDEO_ACCELERATION_ANY,
+    ])
+    if not out.isOpened():
+        # Not every OpenCV build ships an H.264 encoder; fall back to MPEG-4
+        fourcc = cv2.VideoWriter_fourcc(*'mp4v') # Codec for .mp4 files
+        out = cv2.VideoWriter(output_path, fourcc, fps, frame_size)
     return out
\ No newline at end of file
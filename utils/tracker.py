@@ -1,8 +1,60 @@
 # utils/reid_tracker.py
 
-import cv2
 import numpy as np
-from scipy.spatial.distance import cdist
+from scipy.optimize import linear_sum_assignment
+from utils.tracker_kernels import gated_cost_matrix, match_kernel
+
+# Cost given to pairs that fail the distance or appearance check.
+GATED_COST = 1e6
+
+# Minimum histogram correlation for two detections to be the same player.
+MIN_HIST_SIMILARITY = 0.5
+
+# Number of bins in each player's Hue histogram.
+HIST_BINS = 16
+
+# Maps each OpenCV Hue value (0-179) to its histogram bin.
+HUE_LUT = (np.arange(180) * HIST_BINS // 180).astype(np.uint8)
+
+def _build_bgr_bin_lut():
+    """
+    Builds a 32x32x32 table mapping a coarse BGR color to its Hue bin.
+
+    Each channel is cut to 5 bits and the Hue is worked out once, the way
+    cv2.COLOR_BGR2HSV does, at the center of every cell. Index the table
+    with (B >> 3) << 10 | (G >> 3) << 5 | (R >> 3). Gray cells get Hue 0,
+    as in OpenCV.
+    """
+    levels = (np.arange(32) << 3) + 4
+    b, g, r = (c.ravel().astype(np.float64)
+               for c in np.meshgrid(levels, levels, levels, indexing='ij'))
+
+    v = np.maximum(np.maximum(b, g), r)
+    delta = v - np.minimum(np.minimum(b, g), r)
+    safe_delta = np.where(delta > 0, delta, 1)
+    hue = np.where(v == r, 60 * (g - b) / safe_delta,
+          np.where(v == g, 120 + 60 * (b - r) / safe_delta,
+                           240 + 60 * (r - g) / safe_delta))
+    hue = np.where(delta > 0, hue, 0) % 360
+
+    # OpenCV stores 8-bit Hue as degrees / 2 (0-179)
+    hue = np.round(hue / 2).astype(np.int64) % 180
+    return HUE_LUT[hue]
+
+# Maps a 15-bit coarse BGR index straight to a Hue bin (32 KB, fits in L1).
+BGR_BIN_LUT = _build_bgr_bin_lut()
+
+# Starting number of rows in the tracker's arrays (doubled when full).
+INITIAL_CAPACITY = 32
+
+# Starting number of rows in the per-frame detection scratch buffers.
+MAX_DETECTIONS = 64
+
+# Lost-player gallery: how many recently lost players are remembered, for
+# how many frames, and how alike a new detection must look to revive one.
+LOST_GALLERY_SIZE = 64
+LOST_TTL = 150
+MIN_REVIVE_SIMILARITY = 0.7
 
 class ReIDTracker:
     def __init__(self, max_disappeared=20, max_distance=50):
@@ -16,12 +68,47 @@ class ReIDTracker:
                                 on position.
         """
         # --- The Tracker's Memory ---
+        # Each tracked player is one row across these parallel arrays.
+        # Only the first `self._count` rows are in use.
         self.next_player_id = 0
-        self.tracked_players = {}  # {player_id: {'centroid':(x,y), 'hist':hist, ...}}
+        self._count = 0
+        self._ids = np.empty(INITIAL_CAPACITY, dtype=np.int64)
+        self._centroids = np.empty((INITIAL_CAPACITY, 2), dtype=np.int32)
+        self._hists = np.empty((INITIAL_CAPACITY, HIST_BINS), dtype=np.float32)
+        self._disappeared = np.empty(INITIAL_CAPACITY, dtype=np.int32)
+
+        # --- Lost Players ---
+        # A ring buffer of recently deregistered players, kept so that a
+        # player who comes back gets their old ID. A lost frame of -1 marks
+        # an empty slot.
+        self._frame_index = 0
+        self._lost_next = 0
+        self._lost_ids = np.empty(LOST_GALLERY_SIZE, dtype=np.int64)
+        self._lost_hists = np.zeros((LOST_GALLERY_SIZE, HIST_BINS), dtype=np.float32)
+        self._lost_frame = np.full(LOST_GALLERY_SIZE, -1, dtype=np.int64)
+
+        # --- Scratch Buffers ---
+        # Reused every frame for the new detections' centroids.
+        self._scratch_sum = np.empty((MAX_DETECTIONS, 2), dtype=np.float32)
+        self._scratch_new = np.empty((MAX_DETECTIONS, 2), dtype=np.int32)
         
         # --- Configuration ---
         self.max_disappeared = max_disappeared
         self.max_distance = max_distance
+        self._max_distance_sq = max_distance ** 2
+
+    @property
+    def tracked_players(self):
+        """The active players as {player_id: {'centroid':(x,y), 'disappeared':n}}."""
+        n = self._count
+        return {
+            player_id: {'centroid': tuple(centroid), 'disappeared': disappeared}
+            for player_id, centroid, disappeared in zip(
+                self._ids[:n].tolist(),
+                self._centroids[:n].tolist(),
+                self._disappeared[:n].tolist(),
+            )
+        }
 
     def _calculate_histogram(self, frame, bbox):
         """
@@ -31,111 +118,190 @@ class ReIDTracker:
         # 1. Crop the player's image from the frame using the bounding box
         x1, y1, x2, y2 = bbox
         player_img = frame[int(y1):int(y2), int(x1):int(x2)]
-
-        # 2. Convert the cropped image to the HSV color space
-        hsv_img = cv2.cvtColor(player_img, cv2.COLOR_BGR2HSV)
         
-        # 3. Calculate the histogram for the Hue channel
-        # We use the Hue channel as it's most representative of pure color.
-        # We use 16 bins for the histogram for simplicity.
-        hist = cv2.calcHist([hsv_img], [0], None, [16], [0, 180])
+        # 2. Calculate the histogram for the Hue channel
+        # We use Hue as it's most representative of pure color. Rather than
+        # converting to HSV, each pixel's coarse BGR color is looked up
+        # directly in a table of Hue bins, then counted with np.bincount.
+        b = player_img[:, :, 0] >> 3
+        g = player_img[:, :, 1] >> 3
+        r = player_img[:, :, 2] >> 3
+        index = (b.astype(np.uint16) << 10) | (g.astype(np.uint16) << 5) | r
+        hue_bins = BGR_BIN_LUT[index]
+        hist = np.bincount(hue_bins.ravel(), minlength=HIST_BINS).astype(np.float32)
         
-        # 4. Normalize the histogram to a range of 0-255
-        # This makes comparisons more reliable.
-        cv2.normalize(hist, hist, 0, 255, cv2.NORM_MINMAX)
+        # 3. Mean-center and L2-normalize the histogram
+        # The dot product of two such histograms is their correlation
+        # (the same value cv2.compareHist gives with HISTCMP_CORREL), so
+        # matching needs nothing more than a matrix product.
+        hist -= hist.mean()
+        hist /= np.linalg.norm(hist) + 1e-8
         
-        return hist.flatten() # Return the histogram as a flat array
+        return hist # Already a flat array
 
     def register(self, centroid, histogram):
         """Registers a new player with a new ID, centroid, and histogram."""
-        player_id = self.next_player_id
-        self.tracked_players[player_id] = {
-            'centroid': centroid,
-            'hist': histogram,
-            'disappeared': 0
-        }
+        self._append(self.next_player_id, centroid, histogram)
         self.next_player_id += 1
 
+    def _append(self, player_id, centroid, histogram):
+        """Adds a row for `player_id`, growing the arrays when they are full."""
+        if self._count == len(self._ids):
+            capacity = 2 * len(self._ids)
+            self._ids = np.resize(self._ids, capacity)
+            self._centroids = np.resize(self._centroids, (capacity, 2))
+            self._hists = np.resize(self._hists, (capacity, HIST_BINS))
+            self._disappeared = np.resize(self._disappeared, capacity)
+
+        row = self._count
+        self._ids[row] = player_id
+        self._centroids[row] = centroid
+        self._hists[row] = histogram
+        self._disappeared[row] = 0
+        self._count += 1
+
     def deregister(self, player_id):
         """Deregisters a player who has disappeared."""
-        del self.tracked_players[player_id]
+        rows = np.flatnonzero(self._ids[:self._count] == player_id)
+        if len(rows):
+            self._archive_row(rows[0])
+            self._remove_row(rows[0])
+
+    def _archive_row(self, row):
+        """Saves a row's ID and histogram to the lost-player gallery."""
+        slot = self._lost_next
+        self._lost_ids[slot] = self._ids[row]
+        self._lost_hists[slot] = self._hists[row]
+        self._lost_frame[slot] = self._frame_index
+        self._lost_next = (slot + 1) % LOST_GALLERY_SIZE
 
-    def update(self, detections, frame):
+    def _register_or_revive(self, centroid, histogram):
+        """
+        Registers a detection, reusing a lost player's ID if it looks like them.
+
+        The detection is compared by appearance only against every lost player
+        still within LOST_TTL frames; the best match above
+        MIN_REVIVE_SIMILARITY is revived and removed from the gallery.
+        """
+        live = (self._lost_frame >= 0) & (self._frame_index - self._lost_frame <= LOST_TTL)
+        if live.any():
+            sim = self._lost_hists @ histogram
+            sim[~live] = -np.inf
+            slot = sim.argmax()
+            if sim[slot] > MIN_REVIVE_SIMILARITY:
+                self._lost_frame[slot] = -1
+                self._append(self._lost_ids[slot], centroid, histogram)
+                return
+        self.register(centroid, histogram)
+
+    def _remove_row(self, row):
+        """Removes a row by moving the last active row into its place."""
+        last = self._count - 1
+        if row != last:
+            self._ids[row] = self._ids[last]
+            self._centroids[row] = self._centroids[last]
+            self._hists[row] = self._hists[last]
+            self._disappeared[row] = self._disappeared[last]
+        self._count = last
+
+    def _mark_disappeared(self, rows):
+        """Bumps the disappeared counter for `rows` and drops expired players."""
+        self._disappeared[rows] += 1
+        expired = rows[self._disappeared[rows] > self.max_disappeared]
+        # Remove from the back so swap-pops never move a row we still need.
+        for row in np.sort(expired)[::-1]:
+            self._archive_row(row)
+            self._remove_row(row)
+
+    def _centroids_from_boxes(self, boxes):
+        """
+        Returns the (N, 2) int centroids of `boxes` as a view of a scratch buffer.
+
+        The view is overwritten on the next call, so it must not be kept.
+        """
+        n = len(boxes)
+        if n > len(self._scratch_new):
+            self._scratch_sum = np.empty((2 * n, 2), dtype=np.float32)
+            self._scratch_new = np.empty((2 * n, 2), dtype=np.int32)
+
+        sums = self._scratch_sum[:n]
+        centroids = self._scratch_new[:n]
+        np.add(boxes[:, :2], boxes[:, 2:], out=sums)
+        # Casting to int truncates, like int((x1 + x2) / 2)
+        np.multiply(sums, 0.5, out=centroids, casting='unsafe')
+        return centroids
+
+    def update(self, boxes, frame):
         """
         The main engine of the tracker. Updates the state with new detections.
 
         Args:
-            detections (list): A list of dictionaries, where each dictionary
-                               contains the 'bbox' and 'centroid' for a detected player.
+            boxes (np.array): An (N, 4) array with the (x1, y1, x2, y2) bounding
+                              box of each detected player.
             frame (np.array): The full video frame, used for calculating histograms.
         """
+        self._frame_index += 1
+
         # --- Step 1: Handle cases with no detections or no tracked players ---
-        if len(detections) == 0:
-            for player_id in list(self.tracked_players.keys()):
-                self.tracked_players[player_id]['disappeared'] += 1
-                if self.tracked_players[player_id]['disappeared'] > self.max_disappeared:
-                    self.deregister(player_id)
+        if len(boxes) == 0:
+            self._mark_disappeared(np.arange(self._count))
             return self.tracked_players
 
-        if len(self.tracked_players) == 0:
-            for detection in detections:
-                hist = self._calculate_histogram(frame, detection['bbox'])
-                self.register(detection['centroid'], hist)
+        centroids = self._centroids_from_boxes(boxes)
+
+        if self._count == 0:
+            for bbox, centroid in zip(boxes, centroids):
+                hist = self._calculate_histogram(frame, bbox)
+                self._register_or_revive(centroid, hist)
             return self.tracked_players
             
         # --- Step 2: Prepare data for matching ---
-        tracked_ids = list(self.tracked_players.keys())
-        old_centroids = np.array([p['centroid'] for p in self.tracked_players.values()])
-        old_histograms = [p['hist'] for p in self.tracked_players.values()]
+        n = self._count
+        old_centroids = self._centroids[:n]
+        old_hists = self._hists[:n]
         
-        new_centroids = np.array([d['centroid'] for d in detections])
-        new_histograms = [self._calculate_histogram(frame, d['bbox']) for d in detections]
+        new_centroids = centroids
+        new_histograms = [self._calculate_histogram(frame, bbox) for bbox in boxes]
 
         # --- Step 3: Perform matching using both distance and appearance ---
         
-        # Calculate the distance between all old and new centroids
-        dist_matrix = cdist(old_centroids, new_centroids)
+        # Calculate the squared distance between all old and new centroids.
+        # Comparing squared distances against max_distance**2 gives the same
+        # answer without a sqrt per pair, and stays in integer math.
+        diff = old_centroids[:, None, :].astype(np.int64) - new_centroids[None, :, :]
+        dist_sq_matrix = diff[..., 0] ** 2 + diff[..., 1] ** 2
         
         # Calculate the histogram similarity between all old and new players
-        hist_sim_matrix = np.zeros((len(old_histograms), len(new_histograms)))
-        for i in range(len(old_histograms)):
-            for j in range(len(new_histograms)):
-                # cv2.compareHist with CORREL method gives a value between -1 and 1
-                # (1 is a perfect match).
-                hist_sim_matrix[i, j] = cv2.compareHist(old_histograms[i], new_histograms[j], cv2.HISTCMP_CORREL)
-
-        # --- A Simple Matching Strategy ---
-        # We find the best match for each old player based on distance first,
-        # then check if the histogram similarity is good enough.
-        
-        matched_indices = dist_matrix.argmin(axis=1)
-        used_new_indices = set()
-        
-        for i, player_id in enumerate(tracked_ids):
-            best_match_idx = matched_indices[i]
-            
-            # Check 1: Is the distance acceptable?
-            if dist_matrix[i, best_match_idx] < self.max_distance:
-                # Check 2: Is the appearance similar enough?
-                # We set a threshold, e.g., 0.5 for correlation.
-                if hist_sim_matrix[i, best_match_idx] > 0.5:
-                    if best_match_idx not in used_new_indices:
-                        # Successful match! Update the player.
-                        self.tracked_players[player_id]['centroid'] = detections[best_match_idx]['centroid']
-                        self.tracked_players[player_id]['disappeared'] = 0
-                        used_new_indices.add(best_match_idx)
-                        continue # Move to the next tracked player
-
-            # If we reach here, the match failed either by distance or appearance.
-            self.tracked_players[player_id]['disappeared'] += 1
-            if self.tracked_players[player_id]['disappeared'] > self.max_disappeared:
-                self.deregister(player_id)
+        # in one matrix product instead of N*M cv2.compareHist calls.
+        # Histograms are normalized when calculated, so this is between -1
+        # and 1 (1 is a perfect match).
+        new_hists = np.stack(new_histograms)
+        hist_sim_matrix = old_hists @ new_hists.T
+
+        # --- Optimal Matching Strategy ---
+        # We fuse distance and appearance into a single cost and let the
+        # Hungarian algorithm find the globally best one-to-one assignment.
+        # Pairs that fail either check get a huge (but finite) cost so the
+        # solver stays feasible; we throw those pairs away afterwards.
+        cost_matrix = gated_cost_matrix(dist_sq_matrix, hist_sim_matrix, self._max_distance_sq,
+                                        MIN_HIST_SIMILARITY, GATED_COST)
+
+        row_indices, col_indices = linear_sum_assignment(cost_matrix)
+        matched_rows, matched_cols, unmatched_rows, unmatched_new_indices = match_kernel(
+            dist_sq_matrix, hist_sim_matrix, row_indices, col_indices,
+            self._max_distance_sq, MIN_HIST_SIMILARITY)
+
+        # Successful matches! Update the players.
+        self._centroids[matched_rows] = new_centroids[matched_cols]
+        self._disappeared[matched_rows] = 0
+
+        # Any tracked player left unmatched failed by distance or appearance.
+        self._mark_disappeared(unmatched_rows)
         
         # --- Step 4: Handle new players ---
-        unmatched_new_indices = set(range(len(detections))) - used_new_indices
         for idx in unmatched_new_indices:
-            # For this simple Re-ID, we will just register them as new.
-            # A more advanced version would check against lost players here.
-            self.register(detections[idx]['centroid'], new_histograms[idx])
+            # Check against recently lost players first, so a returning
+            # player keeps their old ID instead of getting a new one.
+            self._register_or_revive(new_centroids[idx], new_hists[idx])
             
         return self.tracked_players
\ No newline at end of file
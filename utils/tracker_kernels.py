@@ -0,0 +1,59 @@
+# utils/tracker_kernels.py
+
+import numpy as np
+from numba import njit
+
+@njit(cache=True)
+def gated_cost_matrix(dist_sq, sim, max_d_sq, sim_thr, gated_cost):
+    """
+    Fuses distance and appearance into a single matching cost.
+
+    Distances come in squared; the square root is only taken for pairs
+    that pass the gate. Pairs that are too far apart or do not look alike
+    get `gated_cost`, a huge but finite value, so the assignment solver
+    stays feasible.
+    """
+    n, m = dist_sq.shape
+    cost = np.empty((n, m), dtype=np.float64)
+    for i in range(n):
+        for j in range(m):
+            if dist_sq[i, j] >= max_d_sq or sim[i, j] <= sim_thr:
+                cost[i, j] = gated_cost
+            else:
+                # sqrt(d^2 / max_d^2) == d / max_d
+                cost[i, j] = np.sqrt(dist_sq[i, j] / max_d_sq) + (1.0 - sim[i, j])
+    return cost
+
+@njit(cache=True)
+def match_kernel(dist_sq, sim, row_ind, col_ind, max_d_sq, sim_thr):
+    """
+    Turns a solver assignment into matched pairs and leftovers.
+
+    Returns:
+        tuple: (matched_rows, matched_cols, unmatched_rows, unmatched_cols).
+               Assigned pairs that fail the distance or appearance check are
+               counted as unmatched on both sides.
+    """
+    n, m = dist_sq.shape
+    row_used = np.zeros(n, dtype=np.bool_)
+    col_used = np.zeros(m, dtype=np.bool_)
+    matched_rows = np.empty(len(row_ind), dtype=np.int64)
+    matched_cols = np.empty(len(row_ind), dtype=np.int64)
+
+    k = 0
+    for t in range(len(row_ind)):
+        i = row_ind[t]
+        j = col_ind[t]
+        if dist_sq[i, j] < max_d_sq and sim[i, j] > sim_thr:
+            matched_rows[k] = i
+            matched_cols[k] = j
+            row_used[i] = True
+            col_used[j] = True
+            k += 1
+
+    return (
+        matched_rows[:k],
+        matched_cols[:k],
+        np.flatnonzero(~row_used),
+        np.flatnonzero(~col_used),
+    )